@@ -1,11 +1,117 @@
 #!/usr/bin/env python3
 import argparse
+import collections
+import contextlib
+import functools
+import itertools
+import multiprocessing
 import re
+import sys
+
+@functools.lru_cache(maxsize=None)
+def _compiled(motif, min_repeats):
+    """
+    Compiled pattern for a run of at least 'min_repeats' copies of 'motif'.
+    Cached so each (motif, min_repeats) pair is compiled once per run instead of once per sequence end.
+    """
+    return re.compile(b"(?:%s){%d,}" % (re.escape(motif), min_repeats))
+
+# One motif of a scanner: the motif, its block of 'min_repeats' copies, and its compiled run pattern.
+_MotifEntry = collections.namedtuple("_MotifEntry", ["motif", "needle", "pattern"])
+# Everything the end scan needs for one motif set: the motif entries and the longest needle length.
+_Scanner = collections.namedtuple("_Scanner", ["entries", "longest"])
+
+@functools.lru_cache(maxsize=None)
+def _scanner(motifs, min_repeats):
+    """
+    Build the _Scanner for one motif set, once, so it is shared by every sequence.
+    """
+    entries = tuple(_MotifEntry(motif, motif * min_repeats, _compiled(motif, min_repeats)) for motif in motifs)
+    longest = max(len(entry.needle) for entry in entries)
+    return _Scanner(entries, longest)
+
+def _motifs_present(seq, scanner, start, stop):
+    """
+    Return the scanner entries, in their original order, whose motif has a run of 'min_repeats' copies in seq[start:stop].
+    Uses a literal search for the block of copies.
+    """
+    return [entry for entry in scanner.entries if seq.find(entry.needle, start, stop) != -1]
+
+def _motif_runs(seq, needle, pattern, start, stop, last_start=None):
+    """
+    Yield the same run matches as pattern.finditer(seq, start, stop), without slicing out the region.
+    The block of 'min_repeats' copies (needle) is located with a literal bytes.find, so the regex
+    engine is only run anchored at positions where a run is known to start.
+    If 'last_start' is given, only runs starting at or before it are searched for.
+    """
+    limit = stop if last_start is None else min(stop, last_start + len(needle))
+    pos = seq.find(needle, start, limit)
+    while pos != -1:
+        match = pattern.match(seq, pos, stop)
+        yield match
+        pos = seq.find(needle, max(match.end(), pos + 1), limit)
+
+def _best_run(seq, scanner, start, stop, max_offset, left):
+    """
+    Find the best candidate run in seq[start:stop], scanning forward like re.finditer.
+    A candidate is valid if its outer edge (its start for the left end, its end for the right end)
+    is within 'max_offset' bases of that end of the region. The longest one wins, ties going to
+    the one closest to the end. The best is tracked as candidates are found.
+
+    Returns:
+      (match, motif) for the best candidate, or None
+    """
+    best_match = best_motif = None
+    best_len = -1
+    best_outer = max_offset + 1
+    # A valid candidate has its outermost 'min_repeats' copies within 'reach' bases of the
+    # end, so only motifs present there need scanning.
+    region_len = stop - start
+    reach = min(region_len, max_offset + scanner.longest)
+    if left:
+        present = _motifs_present(seq, scanner, start, start + reach)
+    else:
+        present = _motifs_present(seq, scanner, stop - reach, stop)
+    if not present:
+        return None
+    last_start = start + max_offset if left else None
+    for motif, needle, pattern in present:
+        # Whole copies of this motif cannot fill more of the region than this, so if the best
+        # run is already that long and touches the end, the motif cannot win and is not scanned.
+        longest = region_len - region_len % len(motif)
+        if best_len > longest or (best_len == longest and best_outer == 0):
+            continue
+        for match in _motif_runs(seq, needle, pattern, start, stop, last_start=last_start):
+            outer = match.start() - start if left else stop - match.end()
+            if outer > max_offset:
+                continue
+            length = match.end() - match.start()
+            if length > best_len or (length == best_len and outer < best_outer):
+                best_match, best_motif, best_len, best_outer = match, motif, length, outer
+    if best_match is None:
+        return None
+    return best_match, best_motif
+
+def _find_end(seq, scanner, window, end, max_offset):
+    """
+    find_telomere_end with the motif set's _Scanner already looked up.
+    """
+    if end == 'left':
+        best = _best_run(seq, scanner, 0, min(window, len(seq)), max_offset, left=True)
+    elif end == 'right':
+        best = _best_run(seq, scanner, max(len(seq) - window, 0), len(seq), max_offset, left=False)
+    else:
+        best = None
+    if best is None:
+        return False, None, None, None, None, 0
+    match, motif = best
+    repeat_count = (match.end() - match.start()) // len(motif)
+    return True, match.group(), motif, match.start(), match.end(), repeat_count
 
 def find_telomere_end(seq, motifs, min_repeats, window, end='left', max_offset=10):
     """
     Look for telomere motifs in a specific sequence end.
-    This updated version collects all candidate matches and selects the best one based on the length of the repeat.
+    This updated version considers all candidate matches and selects the best one based on the length of the repeat.
     
     For the left end:
       - A candidate is valid if it starts within 'max_offset' bases from the start.
@@ -14,78 +120,126 @@ def find_telomere_end(seq, motifs, min_repeats, window, end='left', max_offset=1
       - A candidate is valid if its end is within 'max_offset' bases of the end of the search window.
       
     Returns:
-      found (bool), match sequence (str), motif (str), start (int), end (int), repeat_count (int)
+      found (bool), match sequence (bytes), motif (bytes), start (int), end (int), repeat_count (int)
     """
-    candidates = []
-    
-    if end == 'left':
-        region = seq[:window]
-        for motif in motifs:
-            pattern = f"(?:{motif}){{{min_repeats},}}"
-            for match in re.finditer(pattern, region):
-                if match.start() <= max_offset:
-                    candidates.append((match, motif))
-        if candidates:
-            best = max(candidates, key=lambda x: (len(x[0].group()), -x[0].start()))
-            match, motif = best
-            repeat_count = match.group().count(motif)
-            return True, match.group(), motif, match.start(), match.end(), repeat_count
-    
-    elif end == 'right':
-        region = seq[-window:]
-        for motif in motifs:
-            pattern = f"(?:{motif}){{{min_repeats},}}"
-            for match in re.finditer(pattern, region):
-                if (len(region) - match.end()) <= max_offset:
-                    candidates.append((match, motif))
-        if candidates:
-            best = max(candidates, key=lambda x: (len(x[0].group()), x[0].end()))
-            match, motif = best
-            offset = len(seq) - window
-            repeat_count = match.group().count(motif)
-            return True, match.group(), motif, match.start() + offset, match.end() + offset, repeat_count
-
-    return False, None, None, None, None, 0
+    return _find_end(seq, _scanner(tuple(motifs), min_repeats), window, end, max_offset)
+
+def find_telomere_runs(seq, motifs, min_repeats, window, max_offset=10):
+    """
+    Look for telomere motifs at both ends of a sequence, reusing one cached scanner for the motif set.
+
+    Returns:
+      (left result, right result), each in the form returned by find_telomere_end
+    """
+    scanner = _scanner(tuple(motifs), min_repeats)
+    return (_find_end(seq, scanner, window, 'left', max_offset),
+            _find_end(seq, scanner, window, 'right', max_offset))
 
 def process_entry(seq_id, seq, motifs, min_repeats, window):
-    left_found, left_match, left_motif, left_start, left_end, left_repeats = find_telomere_end(seq, motifs, min_repeats, window, end='left')
-    right_found, right_match, right_motif, right_start, right_end, right_repeats = find_telomere_end(seq, motifs, min_repeats, window, end='right')
+    """
+    Scan both ends of one sequence. Matches and motifs stay as bytes until the report is written.
+
+    Returns:
+      (seq_id, length,
+       left_found, left_match, left_motif, left_start, left_end, left_repeats,
+       right_found, right_match, right_motif, right_start, right_end, right_repeats,
+       score)
+    """
+    left, right = find_telomere_runs(seq, motifs, min_repeats, window)
+    left_found, left_match, left_motif, left_start, left_end, left_repeats = left
+    right_found, right_match, right_motif, right_start, right_end, right_repeats = right
 
     score = int(left_found) + int(right_found)
     
-    return {
-        "seq_id": seq_id,
-        "length": len(seq),
-        "left_found": left_found,
-        "left_match": left_match,
-        "left_motif": left_motif,
-        "left_start": left_start,
-        "left_end": left_end,
-        "left_repeats": left_repeats,
-        "right_found": right_found,
-        "right_match": right_match,
-        "right_motif": right_motif,
-        "right_start": right_start,
-        "right_end": right_end,
-        "right_repeats": right_repeats,
-        "score": score
-    }
-
-def parse_fasta(fasta_file):
-    with open(fasta_file, 'r') as f:
-        seq_id = None
-        seq_lines = []
-        for line in f:
-            line = line.strip()
-            if line.startswith(">"):
-                if seq_id is not None:
-                    yield seq_id, "".join(seq_lines)
-                seq_id = line[1:].split()[0]
-                seq_lines = []
-            else:
-                seq_lines.append(line)
-        if seq_id is not None:
-            yield seq_id, "".join(seq_lines)
+    return (
+        seq_id,
+        len(seq),
+        left_found,
+        left_match,
+        left_motif,
+        left_start,
+        left_end,
+        left_repeats,
+        right_found,
+        right_match,
+        right_motif,
+        right_start,
+        right_end,
+        right_repeats,
+        score,
+    )
+
+def _trim_ends(records, window):
+    """
+    Reduce each (seq_id, seq) record to (seq_id, ends, length), where 'ends' keeps only the
+    'window' bases at each end, so pool workers are not sent whole chromosomes.
+    """
+    for seq_id, seq in records:
+        length = len(seq)
+        if length > 2 * window:
+            seq = seq[:window] + seq[length - window:]
+        yield seq_id, seq, length
+
+def _worker(entry, motifs, min_repeats, window):
+    """
+    Pool entry point: scan one (seq_id, ends, length) record from _trim_ends and report
+    lengths and right-end positions for the full sequence.
+    """
+    seq_id, ends, length = entry
+    (seq_id, _,
+     left_found, left_match, left_motif, left_start, left_end, left_repeats,
+     right_found, right_match, right_motif, right_start, right_end, right_repeats,
+     score) = process_entry(seq_id, ends, motifs, min_repeats, window)
+    if right_found:
+        shift = length - len(ends)
+        right_start += shift
+        right_end += shift
+    return (seq_id, length,
+            left_found, left_match, left_motif, left_start, left_end, left_repeats,
+            right_found, right_match, right_motif, right_start, right_end, right_repeats,
+            score)
+
+def _fasta_record(buf, start, stop):
+    """
+    Split the record held in buf[start:stop] (everything after its '>') into its ID and sequence bytes.
+    """
+    newline = buf.find(b"\n", start, stop)
+    if newline == -1:
+        newline = stop
+    seq_id = bytes(buf[start:newline]).split()[0].decode()
+    return seq_id, bytes(buf[newline:stop].translate(None, b" \t\r\n\x0b\x0c"))
+
+def parse_fasta(fasta_file, chunk_size=1 << 20):
+    """
+    Yield (seq_id, sequence) pairs, with the sequence as bytes.
+    The file is read in large binary chunks and records are cut at '\\n>' boundaries,
+    so lines are never stripped and joined one at a time.
+    """
+    with open(fasta_file, 'rb', buffering=chunk_size) as f:
+        # A leading newline lets a header on the first line be found like any other.
+        buf = bytearray(b"\n")
+        start = None  # start of the current record, None until the first header
+        search = 0
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            while True:
+                header = buf.find(b"\n>", search)
+                if header == -1:
+                    break
+                if start is not None:
+                    yield _fasta_record(buf, start, header)
+                start = search = header + 2
+            if not chunk:
+                break
+            # Drop consumed bytes, keeping the last one in case a '\n>' straddles the next chunk.
+            keep = len(buf) - 1 if start is None else start
+            del buf[:keep]
+            search = max(len(buf) - 1, 0)
+            if start is not None:
+                start = 0
+        if start is not None:
+            yield _fasta_record(buf, start, len(buf))
 
 def main():
     parser = argparse.ArgumentParser(
@@ -100,33 +254,46 @@ def main():
                         help="Window size (in bp) at each end to search (default: 200)")
     parser.add_argument("--exclude_no_telomeres", action='store_true',
                         help="Exclude contigs without telomere repeats at both ends")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Number of worker processes used to scan sequences (default: 1)")
     args = parser.parse_args()
+    if args.threads < 1:
+        parser.error("--threads must be at least 1")
 
-    results = []
-    for seq_id, seq in parse_fasta(args.fasta):
-        result = process_entry(seq_id, seq, args.motifs, args.min_repeats, args.window)
-        
-        # Exclude sequences without telomeres if requested
-        if args.exclude_no_telomeres and result['score'] == 0:
-            continue
-        
-        results.append(result)
-
-    # Sort entries by the "score" (number of ends with telomere repeats) in descending order.
-    results = sorted(results, key=lambda r: r["score"], reverse=True)
+    motifs = [motif.encode() for motif in args.motifs]
+    worker = functools.partial(_worker, motifs=motifs, min_repeats=args.min_repeats, window=args.window)
+    # One bucket per score (number of ends with telomere repeats, 0-2).
+    buckets = [[], [], []]
+    records = _trim_ends(parse_fasta(args.fasta), args.window)
+    with multiprocessing.Pool(args.threads) if args.threads > 1 else contextlib.nullcontext() as pool:
+        # imap keeps results in input order, so the sorted output matches a serial run.
+        scanned = pool.imap(worker, records, chunksize=64) if pool else map(worker, records)
+        for result in scanned:
+            score = result[-1]
+            # Exclude sequences without telomeres if requested
+            if args.exclude_no_telomeres and score == 0:
+                continue
+            
+            buckets[score].append(result)
 
-    for res in results:
-        print(f"Entry: {res['seq_id']}")
-        print(f"  Length: {res['length']}")
-        if res["left_found"]:
-            print(f"  Left telomere: YES ({res['left_motif']}) (positions {res['left_start']+1}-{res['left_end']}) sequence: {res['left_match']} (repeats: {res['left_repeats']})")
+    out = []
+    out_append = out.append
+    # Emit entries by score in descending order; each bucket keeps input order.
+    for (seq_id, length,
+         left_found, left_match, left_motif, left_start, left_end, left_repeats,
+         right_found, right_match, right_motif, right_start, right_end, right_repeats,
+         score) in itertools.chain(buckets[2], buckets[1], buckets[0]):
+        out_append(f"Entry: {seq_id}\n  Length: {length}\n")
+        if left_found:
+            out_append(f"  Left telomere: YES ({left_motif.decode()}) (positions {left_start+1}-{left_end}) sequence: {left_match.decode()} (repeats: {left_repeats})\n")
         else:
-            print("  Left telomere: NO")
-        if res["right_found"]:
-            print(f"  Right telomere: YES ({res['right_motif']}) (positions {res['right_start']+1}-{res['right_end']}) sequence: {res['right_match']} (repeats: {res['right_repeats']})")
+            out_append("  Left telomere: NO\n")
+        if right_found:
+            out_append(f"  Right telomere: YES ({right_motif.decode()}) (positions {right_start+1}-{right_end}) sequence: {right_match.decode()} (repeats: {right_repeats})\n\n")
         else:
-            print("  Right telomere: NO")
-        print("")
+            out_append("  Right telomere: NO\n\n")
+    # One write for the whole report instead of several print calls per entry.
+    sys.stdout.write("".join(out))
 
 if __name__ == "__main__":
     main()